@@ -1,5 +1,8 @@
-import secrets
+import atexit
+import base64
+import os
 import smtplib
+import threading
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -8,20 +11,94 @@ from typing import Optional, Tuple
 
 from config import (
     TOKEN_EXPIRY_HOURS,
-    MAX_VERIFICATION_ATTEMPTS,
-    VERIFICATION_COOLDOWN_MINUTES,
+    VERIFICATION_BACKOFF_BASE_SECONDS,
+    VERIFICATION_BACKOFF_MAX_SECONDS,
     EMAIL_FROM,
     EMAIL_SUBJECT,
+    SMTP_HOST,
+    SMTP_PORT,
+    SMTP_USERNAME,
+    SMTP_PASSWORD,
+    SMTP_TIMEOUT,
+    SMTP_MAX_MSGS_PER_CONN,
     SESSION_USER_EMAIL,
     SESSION_IS_VERIFIED,
-    SESSION_VERIFICATION_ATTEMPTS,
     ALLOWED_EMAILS
 )
 import database as db
+import utils
+
+# Buffered CSPRNG output so token generation doesn't need a syscall per token
+_TOKEN_BYTES = 32
+_TOKENS_PER_REFILL = 64
+_entropy_buf = bytearray()
+_entropy_lock = threading.Lock()
+
+# A forked child must never hand out bytes its parent may also use
+# (register_at_fork is Unix-only; there is no fork to guard against elsewhere)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_entropy_buf.clear)
 
 def generate_verification_token() -> str:
-    """Generate a secure verification token."""
-    return secrets.token_urlsafe(32)
+    """Generate a secure verification token (equivalent to secrets.token_urlsafe(32))."""
+    with _entropy_lock:
+        if len(_entropy_buf) < _TOKEN_BYTES:
+            _entropy_buf.extend(os.urandom(_TOKEN_BYTES * _TOKENS_PER_REFILL))
+        chunk = bytes(_entropy_buf[:_TOKEN_BYTES])
+        del _entropy_buf[:_TOKEN_BYTES]
+    return base64.urlsafe_b64encode(chunk).rstrip(b'=').decode('ascii')
+
+# Shared SMTP connection, reused across sends and rotated periodically
+_smtp_conn: Optional[smtplib.SMTP] = None
+_smtp_sent = 0
+_smtp_lock = threading.Lock()
+
+def _close_smtp():
+    """Close the shared SMTP connection, if any."""
+    global _smtp_conn
+    if _smtp_conn is not None:
+        try:
+            _smtp_conn.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        _smtp_conn = None
+
+atexit.register(_close_smtp)
+
+def _get_smtp() -> smtplib.SMTP:
+    """Get a live SMTP connection. Caller must hold _smtp_lock."""
+    global _smtp_conn, _smtp_sent
+    if _smtp_conn is not None and _smtp_sent >= SMTP_MAX_MSGS_PER_CONN:
+        _close_smtp()
+    
+    # Reuse the existing connection if it still answers a NOOP
+    if _smtp_conn is not None:
+        try:
+            if _smtp_conn.noop()[0] == 250:
+                return _smtp_conn
+        except (smtplib.SMTPException, OSError):
+            pass
+        _close_smtp()
+    
+    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    try:
+        server.starttls()
+        if SMTP_USERNAME:
+            server.login(SMTP_USERNAME, SMTP_PASSWORD)
+    except Exception:
+        # Don't leak the socket when the handshake or login fails
+        server.close()
+        raise
+    _smtp_conn = server
+    _smtp_sent = 0
+    return server
+
+def _send_message(msg: MIMEMultipart):
+    """Send a message over the shared SMTP connection."""
+    global _smtp_sent
+    with _smtp_lock:
+        _get_smtp().send_message(msg)
+        _smtp_sent += 1
 
 def send_verification_email(to_email: str, token: str) -> bool:
     """Send verification email with token."""
@@ -43,46 +120,50 @@ def send_verification_email(to_email: str, token: str) -> bool:
         
         msg.attach(MIMEText(body, 'plain'))
 
-        # For development, just print the verification link
-        st.sidebar.info(f"Development mode: Use this link to verify:\n\n{verification_link}")
-        return True
+        # For development (no SMTP server configured), just print the verification link
+        if not SMTP_HOST:
+            st.sidebar.info(f"Development mode: Use this link to verify:\n\n{verification_link}")
+            return True
 
-        # In production, uncomment this to actually send emails
-        # with smtplib.SMTP('smtp.yourserver.com', 587) as server:
-        #     server.starttls()
-        #     server.login('your_email', 'your_password')
-        #     server.send_message(msg)
-        # return True
+        _send_message(msg)
+        return True
 
     except Exception as e:
         st.error(f"Failed to send verification email: {str(e)}")
         return False
 
+def _format_wait(seconds: int) -> str:
+    """Format a back-off wait for display."""
+    return f"{seconds} seconds" if seconds < 60 else f"{-(-seconds // 60)} minutes"
+
 def initialize_session_state():
     """Initialize session state variables."""
     if SESSION_USER_EMAIL not in st.session_state:
         st.session_state[SESSION_USER_EMAIL] = None
     if SESSION_IS_VERIFIED not in st.session_state:
         st.session_state[SESSION_IS_VERIFIED] = False
-    if SESSION_VERIFICATION_ATTEMPTS not in st.session_state:
-        st.session_state[SESSION_VERIFICATION_ATTEMPTS] = 0
 
 def start_verification(email: str) -> Tuple[bool, str]:
     """Start the verification process for an email."""
     initialize_session_state()
     
+    # Emails are case-insensitive; normalize so the allowlist, user record
+    # and verification link all agree
+    email = email.strip().lower()
+    
     # Check if email is in allowlist
     if email not in ALLOWED_EMAILS:
         return False, "This email is not authorized to access the system."
     
-    # Check verification attempts
-    if (st.session_state[SESSION_VERIFICATION_ATTEMPTS] >= 
-        MAX_VERIFICATION_ATTEMPTS):
-        return False, "Too many verification attempts. Please try again later."
-
     # Create user if doesn't exist
     db.create_user(email)
     
+    # Back off exponentially between attempts (tracked per user, not per session)
+    retry_after = db.get_verification_retry_after(email)
+    if retry_after:
+        return False, ("Too many verification attempts. "
+                       f"Please try again in {_format_wait(retry_after)}.")
+    
     # Generate and store token
     token = generate_verification_token()
     db.store_verification_token(email, token, TOKEN_EXPIRY_HOURS)
@@ -91,8 +172,13 @@ def start_verification(email: str) -> Tuple[bool, str]:
     if not send_verification_email(email, token):
         return False, "Failed to send verification email."
     
+    # Only a link that actually went out counts towards the back-off, so
+    # retrying during a mail outage doesn't push the user further out
+    db.record_verification_attempt(
+        email, VERIFICATION_BACKOFF_BASE_SECONDS, VERIFICATION_BACKOFF_MAX_SECONDS
+    )
+    
     st.session_state[SESSION_USER_EMAIL] = email
-    st.session_state[SESSION_VERIFICATION_ATTEMPTS] += 1
     
     return True, "Verification email sent. Please check your inbox."
 
@@ -103,13 +189,22 @@ def verify_email(email: str, token: str) -> Tuple[bool, str]:
     if not email or not token:
         return False, "Invalid verification link."
     
-    if db.verify_token(email, token):
-        db.verify_user(email)
+    # Throttle token guessing; this is separate from the back-off on requesting
+    # links, so bad links can't lock a user out of start_verification
+    retry_after = db.get_token_check_retry_after(email)
+    if retry_after:
+        return False, ("Too many failed verification attempts. "
+                       f"Please try again in {_format_wait(retry_after)}.")
+    
+    if db.verify_token(email, token) and db.verify_user(email):
+        utils.bump_allocation_version(email)
         st.session_state[SESSION_USER_EMAIL] = email
         st.session_state[SESSION_IS_VERIFIED] = True
-        st.session_state[SESSION_VERIFICATION_ATTEMPTS] = 0
         return True, "Email verified successfully."
     
+    db.record_failed_verification(
+        email, VERIFICATION_BACKOFF_BASE_SECONDS, VERIFICATION_BACKOFF_MAX_SECONDS
+    )
     return False, "Invalid or expired verification link."
 
 def is_verified() -> bool:
@@ -126,5 +221,4 @@ def logout():
     """Log out current user."""
     initialize_session_state()
     st.session_state[SESSION_USER_EMAIL] = None
-    st.session_state[SESSION_IS_VERIFIED] = False
-    st.session_state[SESSION_VERIFICATION_ATTEMPTS] = 0 
\ No newline at end of file
+    st.session_state[SESSION_IS_VERIFIED] = False 
\ No newline at end of file
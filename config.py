@@ -6,6 +6,7 @@ BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
 DB_PATH = DATA_DIR / "db.sqlite3"
 PROJECTS_PATH = DATA_DIR / "projects.csv"
+WEBSITE_DATA_PATH = DATA_DIR / "website_data.csv"
 
 # Ensure data directory exists
 DATA_DIR.mkdir(exist_ok=True)
@@ -13,22 +14,32 @@ DATA_DIR.mkdir(exist_ok=True)
 # Application settings
 TOTAL_BUDGET = 5_000_000  # £5M in pounds
 MAX_PROJECTS = 293
+SEARCH_RESULT_LIMIT = 200
 
 # Authentication settings
 TOKEN_EXPIRY_HOURS = 24
-MAX_VERIFICATION_ATTEMPTS = 5
-VERIFICATION_COOLDOWN_MINUTES = 15
+# Wait between verification attempts doubles from the base up to the cap
+VERIFICATION_BACKOFF_BASE_SECONDS = 30
+VERIFICATION_BACKOFF_MAX_SECONDS = 60 * 60
 
-# Allowlist settings
-ALLOWED_EMAILS = {
+# Allowlist settings (stored normalized: stripped and lowercased)
+ALLOWED_EMAILS = frozenset(email.strip().lower() for email in (
     "test@example.com",
     # Add more allowed emails here
-}
+))
 
 # Email settings
 EMAIL_FROM = "noreply@political-awards.org"
 EMAIL_SUBJECT = "Verify your Political Awards allocation account"
 
+# SMTP settings (leave SMTP_HOST unset to show verification links in the UI)
+SMTP_HOST = os.environ.get("SMTP_HOST", "")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
+SMTP_USERNAME = os.environ.get("SMTP_USERNAME", "")
+SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD", "")
+SMTP_TIMEOUT = 30  # seconds
+SMTP_MAX_MSGS_PER_CONN = 100  # Reconnect after this many messages
+
 # Database settings
 DB_POOL_SIZE = 5
 DB_TIMEOUT = 30  # seconds
@@ -39,5 +50,4 @@ MAX_REQUESTS_PER_MINUTE = 60
 # Session keys
 SESSION_USER_EMAIL = "user_email"
 SESSION_IS_VERIFIED = "is_verified"
-SESSION_LAST_ALLOCATION = "last_allocation"
-SESSION_VERIFICATION_ATTEMPTS = "verification_attempts" 
\ No newline at end of file
+SESSION_LAST_ALLOCATION = "last_allocation" 
\ No newline at end of file
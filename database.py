@@ -1,71 +1,179 @@
 import sqlite3
 from contextlib import contextmanager
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+import queue
 import threading
-from config import DB_PATH, DB_TIMEOUT
+from config import DB_PATH, DB_POOL_SIZE, DB_TIMEOUT
 
-# Thread-local storage for database connections
-_local = threading.local()
+# Connection pool: a single shared writer plus a stack of read-only readers
+_writer_lock = threading.Lock()
+_writer_conn: Optional[sqlite3.Connection] = None
+_reader_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+_reader_slots = threading.BoundedSemaphore(DB_POOL_SIZE)
 
-def _create_connection() -> sqlite3.Connection:
+# UPDATE/INSERT ... RETURNING needs SQLite 3.35+
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Bump when the schema in ensure_schema changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 4
+
+# Serializes one-time database setup (journal mode, schema) across threads
+_init_lock = threading.Lock()
+_schema_ready = False
+
+def _create_connection(readonly: bool = False) -> sqlite3.Connection:
     """Create a new database connection with proper settings."""
-    conn = sqlite3.connect(DB_PATH, timeout=DB_TIMEOUT)
+    if readonly:
+        conn = sqlite3.connect(
+            f"{DB_PATH.resolve().as_uri()}?mode=ro",
+            uri=True,
+            timeout=DB_TIMEOUT,
+            check_same_thread=False
+        )
+    else:
+        conn = sqlite3.connect(DB_PATH, timeout=DB_TIMEOUT, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA synchronous = NORMAL")  # Safe under WAL
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -20000")  # ~20MB page cache
+    conn.execute("PRAGMA mmap_size = 268435456")  # 256MB
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_TIMEOUT * 1000)}")
     return conn
 
-def _get_thread_connection() -> sqlite3.Connection:
-    """Get or create a thread-local database connection."""
-    if not hasattr(_local, 'connection'):
-        _local.connection = _create_connection()
-    return _local.connection
+def _get_writer_connection() -> sqlite3.Connection:
+    """Get or create the shared writer connection. Caller must hold _writer_lock."""
+    global _writer_conn
+    if _writer_conn is None:
+        _writer_conn = _create_connection()
+    return _writer_conn
 
-@contextmanager
-def get_connection():
-    """Get a database connection for the current thread."""
-    conn = _get_thread_connection()
+def _acquire_reader() -> sqlite3.Connection:
+    """Pop a pooled read-only connection, opening one lazily if none are idle."""
     try:
-        yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-
-def initialize_db():
-    """Initialize the database with required tables."""
-    with get_connection() as conn:
-        conn.executescript("""
-            CREATE TABLE IF NOT EXISTS users (
-                email TEXT PRIMARY KEY,
-                verified BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-
-            CREATE TABLE IF NOT EXISTS verification_tokens (
-                email TEXT,
-                token TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP,
-                PRIMARY KEY (email, token)
-            );
-
-            CREATE TABLE IF NOT EXISTS allocations (
-                email TEXT,
-                project_id TEXT,
-                amount INTEGER,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (email, project_id),
-                FOREIGN KEY (email) REFERENCES users(email),
-                CHECK (amount >= 0)
-            );
-
-            CREATE INDEX IF NOT EXISTS idx_allocations_email 
-            ON allocations(email);
-            
-            CREATE INDEX IF NOT EXISTS idx_tokens_email_token 
-            ON verification_tokens(email, token);
-        """)
+        return _reader_pool.get_nowait()
+    except queue.Empty:
+        return _create_connection(readonly=True)
+
+@contextmanager
+def get_connection(readonly: bool = False):
+    """Borrow a connection from the pool.
+
+    Writes are serialized on the single writer connection; reads use one of
+    up to DB_POOL_SIZE read-only connections and can run alongside writes.
+    """
+    ensure_schema()
+    
+    if readonly:
+        with _reader_slots:
+            conn = _acquire_reader()
+            try:
+                yield conn
+            finally:
+                _reader_pool.put_nowait(conn)
+        return
+
+    with _writer_lock:
+        conn = _get_writer_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def ensure_schema():
+    """Create or upgrade the database schema, once per process.
+
+    Runs on a dedicated connection the first time a pooled connection is
+    requested, and is skipped entirely once PRAGMA user_version is current.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    
+    with _init_lock:
+        if _schema_ready:
+            return
+        
+        conn = _create_connection()
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                _create_schema(conn)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                conn.commit()
+        finally:
+            conn.close()
+        _schema_ready = True
+
+def _create_schema(conn: sqlite3.Connection):
+    """Create tables and indexes, and migrate databases created before them."""
+    # WAL is persistent in the database file, so it only needs setting once
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS users (
+            email TEXT PRIMARY KEY,
+            verified BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            verification_attempts INTEGER DEFAULT 0,
+            next_attempt_at TIMESTAMP,
+            failed_verifications INTEGER DEFAULT 0,
+            next_verify_at TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS verification_tokens (
+            email TEXT,
+            token TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            PRIMARY KEY (email, token)
+        );
+
+        CREATE TABLE IF NOT EXISTS allocations (
+            email TEXT,
+            project_id TEXT,
+            amount INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (email, project_id),
+            FOREIGN KEY (email) REFERENCES users(email),
+            CHECK (amount >= 0)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_allocations_email 
+        ON allocations(email);
+        
+        CREATE INDEX IF NOT EXISTS idx_tokens_email_token 
+        ON verification_tokens(email, token);
+
+        CREATE INDEX IF NOT EXISTS idx_tokens_token
+        ON verification_tokens(token);
+
+        CREATE INDEX IF NOT EXISTS idx_tokens_expires_at
+        ON verification_tokens(expires_at);
+
+        -- The website search index now lives in memory (see
+        -- rebuild_website_search_index); drop copies left by older versions
+        DROP TABLE IF EXISTS website_data_fts;
+
+        -- Keep the token table bounded without a separate cleanup job
+        CREATE TRIGGER IF NOT EXISTS purge_expired_tokens
+        AFTER INSERT ON verification_tokens
+        BEGIN
+            DELETE FROM verification_tokens
+            WHERE expires_at <= CURRENT_TIMESTAMP;
+        END;
+    """)
+
+    # Add verification back-off columns to users tables created before them
+    columns = {row['name'] for row in conn.execute("PRAGMA table_info(users)")}
+    for column, definition in [
+        ('verification_attempts', 'INTEGER DEFAULT 0'),
+        ('next_attempt_at', 'TIMESTAMP'),
+        ('failed_verifications', 'INTEGER DEFAULT 0'),
+        ('next_verify_at', 'TIMESTAMP'),
+    ]:
+        if column not in columns:
+            conn.execute(f"ALTER TABLE users ADD COLUMN {column} {definition}")
 
 # User operations
 def create_user(email: str) -> bool:
@@ -81,64 +189,149 @@ def create_user(email: str) -> bool:
             return False
 
 def verify_user(email: str) -> bool:
-    """Mark a user as verified."""
+    """Mark a user as verified and return whether they now are."""
+    query = """UPDATE users
+               SET verified = TRUE,
+                   verification_attempts = 0, next_attempt_at = NULL,
+                   failed_verifications = 0, next_verify_at = NULL
+               WHERE email = ?"""
     with get_connection() as conn:
-        cursor = conn.execute(
-            "UPDATE users SET verified = TRUE WHERE email = ?",
-            (email,)
-        )
+        if _HAS_RETURNING:
+            result = conn.execute(query + " RETURNING verified", (email,)).fetchone()
+            return bool(result and result[0])
+        cursor = conn.execute(query, (email,))
         return cursor.rowcount > 0
 
 def is_user_verified(email: str) -> bool:
     """Check if a user is verified."""
-    with get_connection() as conn:
+    with get_connection(readonly=True) as conn:
         result = conn.execute(
             "SELECT verified FROM users WHERE email = ?",
             (email,)
         ).fetchone()
         return bool(result and result[0])
 
+def get_verification_retry_after(email: str) -> int:
+    """Get seconds until the user may attempt verification again (0 if allowed)."""
+    with get_connection(readonly=True) as conn:
+        result = conn.execute(
+            """SELECT CAST(strftime('%s', next_attempt_at) AS INTEGER)
+                      - CAST(strftime('%s', 'now') AS INTEGER)
+               FROM users
+               WHERE email = ? AND next_attempt_at > CURRENT_TIMESTAMP""",
+            (email,)
+        ).fetchone()
+        return max(result[0], 1) if result else 0
+
+def record_verification_attempt(email: str, base_seconds: int, max_seconds: int):
+    """Count a verification attempt and push back the next allowed attempt.
+
+    The wait is base_seconds * 2**attempts, capped at max_seconds.
+    """
+    with get_connection() as conn:
+        # The shift is clamped so large attempt counts can't overflow to zero
+        conn.execute(
+            """UPDATE users
+               SET next_attempt_at = datetime(
+                       'now',
+                       '+' || MIN(? * (1 << MIN(verification_attempts, 30)), ?)
+                           || ' seconds'
+                   ),
+                   verification_attempts = verification_attempts + 1
+               WHERE email = ?""",
+            (base_seconds, max_seconds, email)
+        )
+
+def get_token_check_retry_after(email: str) -> int:
+    """Get seconds until a verification link for the user may be checked again
+    (0 if allowed). Tracked separately from verification requests."""
+    with get_connection(readonly=True) as conn:
+        result = conn.execute(
+            """SELECT CAST(strftime('%s', next_verify_at) AS INTEGER)
+                      - CAST(strftime('%s', 'now') AS INTEGER)
+               FROM users
+               WHERE email = ? AND next_verify_at > CURRENT_TIMESTAMP""",
+            (email,)
+        ).fetchone()
+        return max(result[0], 1) if result else 0
+
+def record_failed_verification(email: str, base_seconds: int, max_seconds: int):
+    """Count a failed verification link and push back the next allowed check.
+
+    Only counts while the user has an unexpired token, so stale links and
+    requests for users with nothing to guess don't throttle anyone.
+    """
+    with get_connection() as conn:
+        conn.execute(
+            """UPDATE users
+               SET next_verify_at = datetime(
+                       'now',
+                       '+' || MIN(? * (1 << MIN(failed_verifications, 30)), ?)
+                           || ' seconds'
+                   ),
+                   failed_verifications = failed_verifications + 1
+               WHERE email = ?
+                 AND EXISTS (SELECT 1 FROM verification_tokens
+                             WHERE email = ? AND expires_at > CURRENT_TIMESTAMP)""",
+            (base_seconds, max_seconds, email, email)
+        )
+
 # Token operations
 def store_verification_token(email: str, token: str, expires_in_hours: int):
     """Store a verification token."""
-    expires_at = datetime.utcnow() + timedelta(hours=expires_in_hours)
+    # Expiry is computed by SQLite so it shares CURRENT_TIMESTAMP's UTC text
+    # format and can be compared against it directly in verify_token
     with get_connection() as conn:
         conn.execute(
             """INSERT INTO verification_tokens (email, token, expires_at)
-               VALUES (?, ?, ?)""",
-            (email, token, expires_at)
+               VALUES (?, ?, datetime('now', ?))""",
+            (email, token, f"+{int(expires_in_hours)} hours")
         )
 
 def verify_token(email: str, token: str) -> bool:
     """Verify a token and return whether it's valid."""
-    with get_connection() as conn:
+    with get_connection(readonly=True) as conn:
         result = conn.execute(
-            """SELECT expires_at FROM verification_tokens 
-               WHERE email = ? AND token = ?""",
+            """SELECT 1 FROM verification_tokens
+               WHERE email = ? AND token = ? AND expires_at > CURRENT_TIMESTAMP
+               LIMIT 1""",
             (email, token)
         ).fetchone()
-        
-        if not result:
-            return False
-            
-        expires_at = datetime.fromisoformat(result[0])
-        return datetime.utcnow() <= expires_at
+        return result is not None
 
 # Allocation operations
-def save_allocation(email: str, project_id: str, amount: int):
-    """Save or update a project allocation."""
+def save_allocation(email: str, project_id: str, amount: int) -> int:
+    """Save or update a project allocation and return the stored amount."""
+    query = """INSERT INTO allocations (email, project_id, amount, updated_at)
+               VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+               ON CONFLICT(email, project_id)
+               DO UPDATE SET amount = excluded.amount,
+                             updated_at = CURRENT_TIMESTAMP"""
     with get_connection() as conn:
-        conn.execute(
+        if _HAS_RETURNING:
+            result = conn.execute(
+                query + " RETURNING amount", (email, project_id, amount)
+            ).fetchone()
+            return result[0]
+        conn.execute(query, (email, project_id, amount))
+        return amount
+
+def save_allocations(email: str, allocations: Dict[str, int]):
+    """Save or update several project allocations in one transaction."""
+    with get_connection() as conn:
+        conn.executemany(
             """INSERT INTO allocations (email, project_id, amount, updated_at)
                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-               ON CONFLICT(email, project_id) 
-               DO UPDATE SET amount = ?, updated_at = CURRENT_TIMESTAMP""",
-            (email, project_id, amount, amount)
+               ON CONFLICT(email, project_id)
+               DO UPDATE SET amount = excluded.amount,
+                             updated_at = CURRENT_TIMESTAMP""",
+            [(email, project_id, amount)
+             for project_id, amount in allocations.items()]
         )
 
 def get_user_allocations(email: str) -> Dict[str, int]:
     """Get all allocations for a user."""
-    with get_connection() as conn:
+    with get_connection(readonly=True) as conn:
         results = conn.execute(
             "SELECT project_id, amount FROM allocations WHERE email = ?",
             (email,)
@@ -147,12 +340,88 @@ def get_user_allocations(email: str) -> Dict[str, int]:
 
 def get_total_allocated(email: str) -> int:
     """Get total amount allocated by a user."""
-    with get_connection() as conn:
+    with get_connection(readonly=True) as conn:
         result = conn.execute(
             "SELECT SUM(amount) FROM allocations WHERE email = ?",
             (email,)
         ).fetchone()
         return result[0] or 0
 
-# Initialize the database
-initialize_db() 
\ No newline at end of file
+def get_budget_state(email: str, project_id: str) -> Tuple[int, int]:
+    """Get a user's total allocated and their existing allocation to a project."""
+    with get_connection(readonly=True) as conn:
+        result = conn.execute(
+            """SELECT COALESCE(SUM(amount), 0),
+                      COALESCE((SELECT amount FROM allocations
+                                WHERE email = ? AND project_id = ?), 0)
+               FROM allocations WHERE email = ?""",
+            (email, project_id, email)
+        ).fetchone()
+        return result[0], result[1]
+
+# Website search operations
+# The FTS5 index is derived from the website CSV, so it lives in a per-process
+# in-memory database (tagged with the fingerprint of the data it was built
+# from) rather than in the tracked user database shared by every process
+_search_conn: Optional[sqlite3.Connection] = None
+_search_fingerprint: Optional[int] = None
+_search_lock = threading.Lock()
+
+def rebuild_website_search_index(rows: Iterable[Tuple[str, str, str]],
+                                 fingerprint: int):
+    """Build the in-memory FTS5 website search index from (url, title,
+    content_summary) rows, unless it already holds the data identified by
+    fingerprint. Each row's rowid is its position in rows.
+
+    Raises sqlite3.OperationalError if SQLite was built without FTS5.
+    """
+    global _search_conn, _search_fingerprint
+    with _search_lock:
+        if _search_conn is not None and _search_fingerprint == fingerprint:
+            return
+        
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        try:
+            conn.execute(
+                """CREATE VIRTUAL TABLE website_data_fts
+                   USING fts5(url, title, content_summary, tokenize='porter')"""
+            )
+            conn.executemany(
+                """INSERT INTO website_data_fts (rowid, url, title, content_summary)
+                   VALUES (?, ?, ?, ?)""",
+                ((position, *row) for position, row in enumerate(rows))
+            )
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        
+        if _search_conn is not None:
+            _search_conn.close()
+        _search_conn, _search_fingerprint = conn, fingerprint
+
+def search_website_data(query: str, limit: int,
+                        fingerprint: int) -> Optional[List[int]]:
+    """Get rowids of websites matching every word of the query as a prefix,
+    best matches first.
+
+    Returns None if the query has no indexable words, or if the index was not
+    built from the data identified by fingerprint.
+    """
+    # Quote each word so user input can't be parsed as FTS5 query syntax, and
+    # drop pure punctuation, which the tokenizer would turn into an empty phrase
+    terms = ['"' + term.replace('"', '""') + '"*' for term in query.split()
+             if any(char.isalnum() for char in term)]
+    if not terms:
+        return None
+    with _search_lock:
+        if _search_conn is None or _search_fingerprint != fingerprint:
+            return None
+        results = _search_conn.execute(
+            """SELECT rowid FROM website_data_fts
+               WHERE website_data_fts MATCH ?
+               ORDER BY rank
+               LIMIT ?""",
+            (' '.join(terms), limit)
+        ).fetchall()
+        return [row[0] for row in results]
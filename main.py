@@ -37,6 +37,7 @@ def render_login():
             submit = st.form_submit_button("Start Verification")
             
             if submit:
+                email = email.strip()  # Tolerate pasted surrounding whitespace
                 if not utils.validate_email(email):
                     st.error("Please enter a valid email address.")
                 else:
@@ -46,6 +47,56 @@ def render_login():
                     else:
                         st.error(message)
 
+@st.fragment
+def render_project_list(df: pd.DataFrame, tab_name: str):
+    """Render the searchable project list.
+
+    Runs as a fragment so typing in the search box only reruns this pane.
+    """
+    # Add surprise me button
+    if st.button("🎲 Surprise Me!", key=f"surprise_{tab_name}"):
+        random_row = df.sample(n=1).iloc[0]
+        st.session_state['selected_website'] = random_row
+        st.rerun()
+        
+    search = st.text_input("Search projects", key=f"website_search_{tab_name}")
+    
+    # Filter websites based on search
+    if search.strip():
+        filtered_df = utils.search_website_data(df, search)
+    else:
+        filtered_df = df
+    
+    # Build display names (title, falling back to URL, truncated) in one pass
+    display_names = filtered_df['title'].where(filtered_df['title'].ne(''), filtered_df['url'])
+    display_names = display_names.where(
+        display_names.str.len() <= 50,
+        display_names.str.slice(0, 47) + "..."
+    )
+    
+    # Display website list as a single selectable table; the search term is
+    # part of the key so a stale row selection never carries over to new results
+    list_key = f"website_list_{tab_name}_{search}"
+    
+    def select_website():
+        rows = st.session_state[list_key].selection.rows
+        if rows:
+            st.session_state['selected_website'] = filtered_df.iloc[rows[0]]
+            st.session_state['website_selection_changed'] = True
+    
+    st.dataframe(
+        pd.DataFrame({'Project': display_names.to_numpy()}),
+        hide_index=True,
+        use_container_width=True,
+        on_select=select_website,
+        selection_mode="single-row",
+        key=list_key
+    )
+    
+    # Selection changes the detail columns outside this fragment, so rerun the app
+    if st.session_state.pop('website_selection_changed', False):
+        st.rerun()
+
 def render_explorer():
     """Render project explorer tab."""
     # Custom CSS for fixed layout and scrollable columns
@@ -128,8 +179,8 @@ def render_explorer():
     
     # Load website data
     try:
-        df = pd.read_csv('data/website_data.csv')
-        df = df.fillna('')  # Replace NaN with empty strings
+        df = utils.load_website_data()
+        utils.ensure_website_search_index(df)
     except Exception as e:
         st.error(f"Error loading website data: {str(e)}")
         return
@@ -140,37 +191,10 @@ def render_explorer():
     with col1:
         st.subheader("Projects")
         
-        # Create a search box with a unique key for each tab
+        # Resolve the tab here: fragment reruns skip main(), so 'active_tab'
+        # would otherwise hold whichever tab rendered last
         tab_name = st.session_state.get('active_tab', 'explorer')
-        
-        # Add surprise me button
-        if st.button("🎲 Surprise Me!", key=f"surprise_{tab_name}"):
-            random_row = df.sample(n=1).iloc[0]
-            st.session_state['selected_website'] = random_row
-            st.rerun()
-            
-        search = st.text_input("Search projects", key=f"website_search_{tab_name}")
-        
-        # Filter websites based on search
-        if search:
-            mask = (
-                df['url'].str.contains(search, case=False, na=False) |
-                df['title'].str.contains(search, case=False, na=False) |
-                df['content_summary'].str.contains(search, case=False, na=False)
-            )
-            filtered_df = df[mask]
-        else:
-            filtered_df = df
-        
-        # Display website list with regular Streamlit buttons
-        for _, row in filtered_df.iterrows():
-            display_name = row['title'] if row['title'] else row['url']
-            if len(display_name) > 50:
-                display_name = display_name[:47] + "..."
-            
-            if st.button(display_name, key=f"btn_{tab_name}_{row['url']}"):
-                st.session_state['selected_website'] = row
-                st.rerun()
+        render_project_list(df, tab_name)
     
     with col2:
         if 'selected_website' in st.session_state and st.session_state['selected_website'] is not None:
@@ -191,13 +215,13 @@ def render_explorer():
                 stats_col1, stats_col2 = st.columns(2)
                 
                 with stats_col1:
-                    st.metric("⭐ Stars", f"{website['stars']:,}")
-                    st.metric("🔄 Forks", f"{website['forks']:,}")
-                    st.metric("⚠️ Open Issues", f"{website['open_issues']:,}")
+                    st.metric("⭐ Stars", website['stars_display'])
+                    st.metric("🔄 Forks", website['forks_display'])
+                    st.metric("⚠️ Open Issues", website['open_issues_display'])
                 
                 with stats_col2:
-                    st.metric("📅 Created", website['created_at'].split('T')[0] if website['created_at'] else 'N/A')
-                    st.metric("🔄 Last Update", website['last_update'].split('T')[0] if website['last_update'] else 'N/A')
+                    st.metric("📅 Created", website['created_at_date'])
+                    st.metric("🔄 Last Update", website['last_update_date'])
                     st.metric("💻 Language", website['language'] if website['language'] else 'N/A')
             else:
                 # Display regular metadata for non-GitHub websites
@@ -1,28 +1,87 @@
+import itertools
 import re
+import sqlite3
+import threading
 import pandas as pd
 from typing import Dict, List, Optional, Tuple
 import streamlit as st
-from config import TOTAL_BUDGET, MAX_PROJECTS
+from config import (
+    TOTAL_BUDGET,
+    MAX_PROJECTS,
+    SEARCH_RESULT_LIMIT,
+    WEBSITE_DATA_PATH
+)
 import database as db
 
+# \Z rather than $ so a trailing newline is not accepted
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\Z')
+
 def validate_email(email: str) -> bool:
     """Validate email format."""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return _EMAIL_RE.match(email) is not None
 
 def validate_allocation_amount(amount: int) -> bool:
     """Validate a single allocation amount."""
     return isinstance(amount, int) and amount >= 0
 
+# Per-email allocation cache versions. Like st.cache_data itself these are
+# shared by every session in the process, and each bump draws a fresh value
+# from one counter so two writers can never land on the same cache key.
+_alloc_versions: Dict[str, int] = {}
+_alloc_version_counter = itertools.count(1)
+_alloc_versions_lock = threading.Lock()
+
+def get_allocation_version(email: str) -> int:
+    """Get the allocation cache version for a user."""
+    return _alloc_versions.get(email, 0)
+
+def bump_allocation_version(email: str):
+    """Invalidate cached allocation reads for a user after a write."""
+    with _alloc_versions_lock:
+        _alloc_versions[email] = next(_alloc_version_counter)
+
+# Every save orphans the previous version's entry, so bound the cache size
+@st.cache_data(ttl=3600, max_entries=256)
+def _allocations_frame(email: str, version: int) -> pd.DataFrame:
+    """Cache a user's allocations as a DataFrame for a given cache version."""
+    allocations = db.get_user_allocations(email)
+    return pd.DataFrame({
+        'project_id': pd.Series(list(allocations), dtype=object),
+        'amount': pd.Series(list(allocations.values()), dtype='int64')
+    })
+
+def get_allocations_frame(email: str) -> pd.DataFrame:
+    """Get a user's allocations as a DataFrame, served from cache between writes."""
+    return _allocations_frame(email, get_allocation_version(email))
+
+def get_user_allocations(email: str) -> Dict[str, int]:
+    """Get all allocations for a user, served from cache between writes."""
+    alloc_df = get_allocations_frame(email)
+    return dict(zip(alloc_df['project_id'].tolist(), alloc_df['amount'].tolist()))
+
+def get_total_allocated(email: str) -> int:
+    """Get total amount allocated by a user, served from cache between writes."""
+    return int(get_allocations_frame(email)['amount'].sum())
+
+def save_allocation(email: str, project_id: str, amount: int) -> int:
+    """Save a project allocation and invalidate cached reads."""
+    saved_amount = db.save_allocation(email, project_id, amount)
+    bump_allocation_version(email)
+    return saved_amount
+
+def save_allocations(email: str, allocations: Dict[str, int]):
+    """Save several project allocations and invalidate cached reads."""
+    db.save_allocations(email, allocations)
+    bump_allocation_version(email)
+
 def validate_total_allocation(email: str, new_amount: int, 
                             project_id: str) -> Tuple[bool, str]:
     """Validate total allocation against budget."""
-    current_total = db.get_total_allocated(email)
+    # One O(1) aggregate query instead of loading the full allocations frame
+    total_allocated, existing_amount = db.get_budget_state(email, project_id)
     
     # Adjust for updating existing allocation
-    current_allocations = db.get_user_allocations(email)
-    if project_id in current_allocations:
-        current_total -= current_allocations[project_id]
+    current_total = total_allocated - existing_amount
     
     new_total = current_total + new_amount
     
@@ -42,40 +101,91 @@ def load_projects() -> pd.DataFrame:
         
         if not all(col in df.columns for col in required_columns):
             raise ValueError("Missing required columns in projects.csv")
-            
+        
+        # Precompute a lowercase search column so filtering is a single scan
+        df['_search_blob'] = (
+            df['name'].fillna('').str.lower() + '|' +
+            df['description'].fillna('').str.lower()
+        )
         return df
     except Exception as e:
         st.error(f"Error loading projects: {str(e)}")
         return pd.DataFrame(columns=['project_id', 'name', 'description', 
                                    'category', 'status'])
 
+@st.cache_data(ttl=24 * 60 * 60)
+def load_website_data() -> pd.DataFrame:
+    """Load and cache website data with a prebuilt lowercase search column.
+
+    Has no side effects; call ensure_website_search_index on the result.
+    """
+    df = pd.read_csv(WEBSITE_DATA_PATH).fillna('')  # Replace NaN with empty strings
+    df['_search_blob'] = (
+        df['url'] + ' ' + df['title'] + ' ' + df['content_summary']
+    ).str.lower()
+    
+    # Pre-format GitHub stats once per load instead of on every render
+    for col in ['stars', 'forks', 'open_issues']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+        df[f'{col}_display'] = df[col].astype(object).map(
+            lambda count: f"{count:,}", na_action='ignore'
+        ).fillna('N/A')
+    for col in ['created_at', 'last_update']:
+        df[f'{col}_date'] = pd.to_datetime(
+            df[col], errors='coerce', utc=True
+        ).dt.strftime('%Y-%m-%d').fillna('N/A')
+    
+    # Identifies the searchable content so the FTS5 index is rebuilt only
+    # when it changes (see ensure_website_search_index)
+    df.attrs['fingerprint'] = int(pd.util.hash_pandas_object(
+        df[['url', 'title', 'content_summary']]
+    ).sum())
+    return df
+
+def ensure_website_search_index(df: pd.DataFrame):
+    """Build the FTS5 search index for the loaded website data if this process
+    doesn't already have one for it."""
+    try:
+        db.rebuild_website_search_index(
+            df[['url', 'title', 'content_summary']].itertuples(index=False, name=None),
+            df.attrs['fingerprint']
+        )
+    except sqlite3.OperationalError:
+        pass  # SQLite without FTS5; search_website_data uses the blob scan
+
+def search_website_data(df: pd.DataFrame, query: str) -> pd.DataFrame:
+    """Filter website data by a search query, best matches first."""
+    rowids = db.search_website_data(query, SEARCH_RESULT_LIMIT, df.attrs['fingerprint'])
+    
+    # No index for this data, or nothing indexable in the query: substring scan
+    if rowids is None:
+        return df[df['_search_blob'].str.contains(query.lower(), regex=False)]
+    return df.iloc[rowids]
+
 def filter_projects(df: pd.DataFrame, 
                    search_query: str = "",
                    categories: List[str] = None,
                    statuses: List[str] = None) -> pd.DataFrame:
     """Filter projects based on search query and filters."""
-    if df.empty:
+    if df.empty or not (search_query or categories or statuses):
         return df
-        
-    filtered_df = df.copy()
+    
+    # Combine all filters into one mask so the frame is indexed only once
+    mask = pd.Series(True, index=df.index)
     
     # Apply text search
     if search_query:
-        search_mask = (
-            filtered_df['name'].str.contains(search_query, case=False, na=False) |
-            filtered_df['description'].str.contains(search_query, case=False, na=False)
-        )
-        filtered_df = filtered_df[search_mask]
+        mask &= df['_search_blob'].str.contains(search_query.lower(), regex=False)
     
     # Apply category filter
     if categories:
-        filtered_df = filtered_df[filtered_df['category'].isin(categories)]
+        mask &= df['category'].isin(categories)
     
     # Apply status filter
     if statuses:
-        filtered_df = filtered_df[filtered_df['status'].isin(statuses)]
+        mask &= df['status'].isin(statuses)
     
-    return filtered_df
+    return df.loc[mask]
 
 def format_currency(amount: int) -> str:
     """Format amount as currency."""
@@ -83,10 +193,10 @@ def format_currency(amount: int) -> str:
 
 def calculate_allocation_metrics(email: str) -> Dict[str, int]:
     """Calculate allocation metrics for a user."""
-    allocations = db.get_user_allocations(email)
-    total_allocated = sum(allocations.values())
+    alloc_df = get_allocations_frame(email)
+    total_allocated = int(alloc_df['amount'].sum())
     remaining_budget = TOTAL_BUDGET - total_allocated
-    num_projects = len(allocations)
+    num_projects = len(alloc_df)
     
     return {
         'total_allocated': total_allocated,
@@ -98,15 +208,7 @@ def calculate_allocation_metrics(email: str) -> Dict[str, int]:
 def get_category_allocation_data(email: str) -> pd.DataFrame:
     """Get allocation data grouped by category."""
     projects_df = load_projects()
-    allocations = db.get_user_allocations(email)
-    
-    # Create DataFrame with allocations
-    alloc_df = pd.DataFrame.from_dict(
-        allocations, 
-        orient='index', 
-        columns=['amount']
-    ).reset_index()
-    alloc_df.columns = ['project_id', 'amount']
+    alloc_df = get_allocations_frame(email)
     
     # Merge with projects data
     merged_df = alloc_df.merge(
@@ -115,25 +217,17 @@ def get_category_allocation_data(email: str) -> pd.DataFrame:
     )
     
     # Group by category
-    category_data = merged_df.groupby('category')['amount'].agg([
-        'sum', 'count'
-    ]).reset_index()
+    category_data = merged_df.groupby('category').agg(
+        total_amount=('amount', 'sum'),
+        project_count=('amount', 'count')
+    ).reset_index()
     
-    category_data.columns = ['category', 'total_amount', 'project_count']
     return category_data
 
 def export_allocations(email: str) -> pd.DataFrame:
     """Export user allocations as DataFrame."""
     projects_df = load_projects()
-    allocations = db.get_user_allocations(email)
-    
-    # Create DataFrame with allocations
-    alloc_df = pd.DataFrame.from_dict(
-        allocations, 
-        orient='index', 
-        columns=['amount']
-    ).reset_index()
-    alloc_df.columns = ['project_id', 'amount']
+    alloc_df = get_allocations_frame(email)
     
     # Merge with projects data
     export_df = alloc_df.merge(